@@ -3,13 +3,21 @@ Main entry point for the Video Chat Room application.
 """
 
 import asyncio
+import hashlib
 import logging
+import multiprocessing
 import os
+import socket
 from aiohttp import web
 import aiohttp_cors
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 from src.video_app import VideoChatApplication
-from src.config import HOST, PORT, LOG_LEVEL, CORS_ORIGINS
+from src.config import HOST, PORT, WORKERS, LOG_LEVEL, CORS_ORIGINS, TEMPLATE_RELOAD
 
 # Configure logging
 logging.basicConfig(
@@ -18,34 +26,140 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Location of the single-page client
+_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+# Pre-serialized health check response body
+_HEALTH_BODY = b'{"status": "healthy", "service": "video-chat-room"}'
+
 
 async def index_handler(request):
     """Serve the main HTML page."""
+    if TEMPLATE_RELOAD:
+        # Development mode: pick up template edits without a restart.
+        # FileResponse stats the file off the loop and uses sendfile when possible.
+        return web.FileResponse(
+            _TEMPLATE_PATH,
+            headers={'Content-Type': 'text/html; charset=utf-8'}
+        )
+    
+    html_content = request.app['index_html']
+    if html_content is None:
+        return web.Response(text="Template file not found", status=404)
+    
+    etag = request.app['index_etag']
+    if request.headers.get('If-None-Match') == etag:
+        return web.Response(status=304, headers={'ETag': etag})
+    
+    return web.Response(
+        body=html_content,
+        content_type='text/html',
+        charset='utf-8',
+        headers={'ETag': etag}
+    )
+
+
+def _read_template(template_path):
+    """Read the HTML template from disk. Returns None if it does not exist."""
     try:
-        # Read the HTML template
-        template_path = os.path.join(os.path.dirname(__file__), 'templates', 'index.html')
-        
-        if not os.path.exists(template_path):
-            # Fallback to inline HTML if template file doesn't exist
-            logger.warning(f"Template file not found at {template_path}, using fallback")
-            return web.Response(text="Template file not found", status=404)
-        
-        with open(template_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        return web.Response(text=html_content, content_type='text/html')
-        
-    except Exception as e:
-        logger.error(f"Error serving index page: {e}")
-        return web.Response(text="Internal server error", status=500)
+        with open(template_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def load_index_template(app):
+    """Read the HTML template once and cache it on the application."""
+    html_content = _read_template(_TEMPLATE_PATH)
+    
+    if html_content is None:
+        logger.warning(f"Template file not found at {_TEMPLATE_PATH}")
+        app['index_html'] = None
+        app['index_etag'] = None
+        return
+    
+    app['index_html'] = html_content
+    app['index_etag'] = f'"{hashlib.blake2b(html_content, digest_size=8).hexdigest()}"'
+    logger.info(f"Loaded template {_TEMPLATE_PATH} ({len(html_content)} bytes)")
 
 
 async def health_handler(request):
     """Health check endpoint."""
-    return web.json_response({
-        "status": "healthy",
-        "service": "video-chat-room"
-    })
+    return web.Response(body=_HEALTH_BODY, content_type='application/json')
+
+
+# Response headers browsers expose without being listed (CORS-safelisted)
+_SIMPLE_RESPONSE_HEADERS = frozenset(
+    ('cache-control', 'content-language', 'content-type', 'expires', 'last-modified', 'pragma')
+)
+
+
+def _add_vary_origin(response):
+    """Add Origin to the response's Vary header, keeping any existing entries."""
+    vary = response.headers.get('Vary')
+    if not vary:
+        response.headers['Vary'] = 'Origin'
+    elif 'origin' not in {item.strip().lower() for item in vary.split(',')}:
+        response.headers['Vary'] = f'{vary}, Origin'
+
+
+def _set_cors_headers(request, response):
+    """Add wildcard CORS headers, echoing the origin so credentials stay allowed."""
+    origin = request.headers.get('Origin')
+    if origin is None:
+        return
+    
+    response.headers['Access-Control-Allow-Origin'] = origin
+    response.headers['Access-Control-Allow-Credentials'] = 'true'
+    _add_vary_origin(response)
+
+
+def _set_expose_headers(response):
+    """List the response's own header names; '*' is literal on credentialed requests."""
+    exposed = [
+        name for name in response.headers
+        if name.lower() not in _SIMPLE_RESPONSE_HEADERS
+        and not name.lower().startswith('access-control-')
+    ]
+    if exposed:
+        response.headers['Access-Control-Expose-Headers'] = ','.join(exposed)
+
+
+def _preflight_response(request):
+    """Build the answer to a CORS preflight request."""
+    response = web.Response(status=204)
+    _set_cors_headers(request, response)
+    response.headers['Access-Control-Allow-Methods'] = request.headers['Access-Control-Request-Method']
+    response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+        'Access-Control-Request-Headers', '*'
+    )
+    return response
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Attach CORS headers to every response when all origins are allowed.
+    
+    Preflights are answered here rather than through a catch-all OPTIONS
+    route, so unknown paths still return 404.
+    """
+    if request.method == 'OPTIONS' and 'Access-Control-Request-Method' in request.headers:
+        return _preflight_response(request)
+    
+    try:
+        response = await handler(request)
+    except web.HTTPException as exc:
+        # Raised errors (404s, FileResponse misses) carry CORS headers too
+        if 'Origin' in request.headers:
+            _set_cors_headers(request, exc)
+            _set_expose_headers(exc)
+        raise
+    
+    # WebSocket and streamed responses have already sent their headers
+    if not response.prepared and 'Origin' in request.headers:
+        _set_cors_headers(request, response)
+        _set_expose_headers(response)
+    return response
 
 
 async def create_app():
@@ -53,31 +167,38 @@ async def create_app():
     # Initialize the main application
     app_instance = VideoChatApplication()
     
-    # Create aiohttp app
-    app = web.Application()
-    
-    # Setup CORS
-    cors = aiohttp_cors.setup(app, defaults={
-        origin: aiohttp_cors.ResourceOptions(
-            allow_credentials=True,
-            expose_headers="*",
-            allow_headers="*",
-            allow_methods="*"
-        )
-        for origin in CORS_ORIGINS
-    })
+    routes = [
+        ('GET', '/', index_handler),
+        ('GET', '/health', health_handler),
+        ('GET', '/ws', app_instance.websocket_handler),
+        ('POST', '/upload', app_instance.upload_file),
+        ('GET', '/sessions/{session_id}/files', app_instance.get_session_files),
+        ('GET', '/stats', app_instance.get_stats),
+    ]
     
-    # Routes
-    app.router.add_get('/', index_handler)
-    app.router.add_get('/health', health_handler)
-    app.router.add_get('/ws', app_instance.websocket_handler)
-    app.router.add_post('/upload', app_instance.upload_file)
-    app.router.add_get('/sessions/{session_id}/files', app_instance.get_session_files)
-    app.router.add_get('/stats', app_instance.get_stats)
+    if CORS_ORIGINS == ['*']:
+        # Wildcard CORS: a single middleware handles headers and preflights
+        app = web.Application(middlewares=[cors_middleware])
+        for method, path, handler in routes:
+            app.router.add_route(method, path, handler)
+    else:
+        # Explicit origin list: let aiohttp_cors enforce it per resource
+        app = web.Application()
+        cors = aiohttp_cors.setup(app, defaults={
+            origin: aiohttp_cors.ResourceOptions(
+                allow_credentials=True,
+                expose_headers="*",
+                allow_headers="*",
+                allow_methods="*"
+            )
+            for origin in CORS_ORIGINS
+        })
+        for method, path, handler in routes:
+            resource = cors.add(app.router.add_resource(path))
+            cors.add(resource.add_route(method, handler))
     
-    # Add CORS to all routes
-    for route in list(app.router.routes()):
-        cors.add(route)
+    # Cache the index page in memory
+    load_index_template(app)
     
     # Store app instance for cleanup
     app['chat_app'] = app_instance
@@ -93,10 +214,22 @@ async def cleanup_handler(app):
     try:
         chat_app = app.get('chat_app')
         if chat_app:
+            # Let cleanups of already-disconnected users finish first
+            await chat_app.wait_for_cleanups()
+            
+            # Stop the signalling flush timer and send what is still queued
+            await chat_app.webrtc_manager.close()
+            
             # Clean up all active connections
-            all_users = chat_app.connection_manager.get_all_users()
-            for user_id in list(all_users.keys()):
-                await chat_app.cleanup_user(user_id)
+            # Snapshot the IDs since cleanup_user mutates the connection map
+            user_ids = list(chat_app.connection_manager.get_all_users())
+            results = await asyncio.gather(
+                *(chat_app.cleanup_user(user_id) for user_id in user_ids),
+                return_exceptions=True
+            )
+            for user_id, result in zip(user_ids, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error cleaning up user {user_id}: {result}")
             
             # Clean up any remaining resources
             await chat_app.webrtc_manager.cleanup_all_user_connections('')
@@ -107,24 +240,85 @@ async def cleanup_handler(app):
         logger.error(f"Error during cleanup: {e}")
 
 
+async def startup_handler(app):
+    """Startup handler for event loop tuning."""
+    # Eager tasks run synchronously until their first real suspension (Python 3.12+)
+    if hasattr(asyncio, 'eager_task_factory'):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+        logger.info("Enabled eager task factory")
+
+
 async def init_app():
-    """Initialize the application with cleanup handlers."""
+    """Initialize the application with startup and cleanup handlers."""
     app = await create_app()
     
-    # Add cleanup handler
+    # Add startup and cleanup handlers
+    app.on_startup.append(startup_handler)
     app.on_cleanup.append(cleanup_handler)
     
     return app
 
 
+def _create_reuseport_socket(host, port):
+    """Create a listening socket that other workers can bind to as well."""
+    # Resolve the address family so IPv6 hosts such as '::' work too
+    family, socktype, proto, _, sockaddr = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+    )[0]
+    sock = socket.socket(family, socktype, proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(sockaddr)
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
+
+
+def _run_server(**kwargs):
+    """Run the aiohttp application in the current process."""
+    # Use the libuv-based event loop when available
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    
+    try:
+        web.run_app(init_app(), **kwargs)
+    except KeyboardInterrupt:
+        logger.info("Server shutdown requested")
+
+
+def _run_worker(host, port):
+    """Worker process entry point: bind a SO_REUSEPORT socket and serve."""
+    logger.info(f"Worker {os.getpid()} listening on {host}:{port}")
+    _run_server(sock=_create_reuseport_socket(host, port))
+
+
 def main():
     """Main entry point."""
     logger.info(f"Starting Video Chat Room server on {HOST}:{PORT}")
     logger.info(f"Log level: {LOG_LEVEL}")
     logger.info(f"CORS origins: {CORS_ORIGINS}")
     
+    workers = WORKERS
+    if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        logger.warning("SO_REUSEPORT is not supported on this platform, running a single worker")
+        workers = 1
+    
     try:
-        web.run_app(init_app(), host=HOST, port=PORT)
+        if workers == 1:
+            _run_server(host=HOST, port=PORT)
+            return
+        
+        # Each worker binds its own socket and the kernel balances connections
+        logger.info(f"Starting {workers} worker processes")
+        processes = [
+            multiprocessing.Process(target=_run_worker, args=(HOST, PORT))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
     except KeyboardInterrupt:
         logger.info("Server shutdown requested")
     except Exception as e:
@@ -7,6 +7,10 @@ import os
 # Server Configuration
 HOST = os.getenv('HOST', 'localhost')
 PORT = int(os.getenv('PORT', 8080))
+# Number of worker processes sharing the port via SO_REUSEPORT (0 = one per CPU).
+# Room, connection and recording state is per process, so users of the same
+# room must reach the same worker when this is greater than 1.
+WORKERS = int(os.getenv('WORKERS', 1)) or (os.cpu_count() or 1)
 
 # Room Configuration
 MAX_USERS_PER_ROOM = int(os.getenv('MAX_USERS_PER_ROOM', 5))
@@ -15,12 +19,27 @@ DEFAULT_ROOM_ID = os.getenv('DEFAULT_ROOM_ID', 'default')
 # Session Configuration
 SESSIONS_BASE_PATH = os.getenv('SESSIONS_BASE_PATH', 'sessions')
 
+# Template Configuration
+# Re-read templates/index.html on every request (development only)
+TEMPLATE_RELOAD = os.getenv('TEMPLATE_RELOAD', 'false').lower() in ('1', 'true', 'yes')
+
 # WebRTC Configuration
 ICE_SERVERS = [
     {"urls": "stun:stun.l.google.com:19302"},
     {"urls": "stun:stun1.l.google.com:19302"}
 ]
 
+# Signalling Configuration
+# Offers, answers and ICE candidates are batched per user and flushed after
+# this many seconds, or as soon as SIGNALING_BATCH_SIZE messages are queued
+SIGNALING_FLUSH_INTERVAL = float(os.getenv('SIGNALING_FLUSH_INTERVAL', 0.01))
+SIGNALING_BATCH_SIZE = int(os.getenv('SIGNALING_BATCH_SIZE', 32))
+
+# WebSocket Configuration
+# Ping interval in seconds; peers that miss a pong are closed and cleaned up
+WS_HEARTBEAT = float(os.getenv('WS_HEARTBEAT', 20.0))
+WS_MAX_MSG_SIZE = int(os.getenv('WS_MAX_MSG_SIZE', 4 * 1024 * 1024))  # 4MB
+
 # CORS Configuration
 CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
 
@@ -29,6 +48,7 @@ LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
 # File Upload Configuration
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 100 * 1024 * 1024))  # 100MB
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 64 * 1024))  # 64KB per read
 ALLOWED_EXTENSIONS = {
     'audio': ['.mp3', '.wav', '.ogg', '.m4a', '.webm'],
     'video': ['.mp4', '.webm', '.avi', '.mov', '.mkv']
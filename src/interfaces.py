@@ -4,12 +4,14 @@ Following the Dependency Inversion Principle (SOLID).
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, AsyncIterable, Dict, List, Mapping, Optional, Tuple
 from aiohttp import web_ws
-from aiortc import RTCPeerConnection
 
 from src.models import User, Room, RecordingSession
 
+if TYPE_CHECKING:
+    from aiortc import RTCPeerConnection
+
 
 class IConnectionManager(ABC):
     """Interface for managing WebSocket connections."""
@@ -30,8 +32,13 @@ class IConnectionManager(ABC):
         pass
     
     @abstractmethod
-    def get_all_users(self) -> Dict[str, User]:
-        """Get all connected users."""
+    def get_all_users(self) -> Mapping[str, User]:
+        """Get a read-only view of all connected users."""
+        pass
+    
+    @abstractmethod
+    def set_user_room(self, user_id: str, room_id: Optional[str]) -> None:
+        """Record which room a user is in (None when the user leaves)."""
         pass
     
     @abstractmethod
@@ -106,6 +113,12 @@ class IStorageManager(ABC):
         """Save a file to the session folder and return the file path."""
         pass
     
+    @abstractmethod
+    async def save_stream(self, session_id: str, filename: str,
+                          chunks: AsyncIterable[bytes]) -> Tuple[str, int]:
+        """Stream chunks to a file in the session folder and return its path and size."""
+        pass
+    
     @abstractmethod
     async def get_session_files(self, session_id: str) -> List[str]:
         """Get list of files in a session folder."""
@@ -131,7 +144,7 @@ class IWebRTCManager(ABC):
     """Interface for managing WebRTC peer connections."""
     
     @abstractmethod
-    async def create_peer_connection(self, user_id: str, target_id: str) -> RTCPeerConnection:
+    async def create_peer_connection(self, user_id: str, target_id: str) -> "RTCPeerConnection":
         """Create a peer connection between two users."""
         pass
     
@@ -175,8 +188,8 @@ class IRecordingManager(ABC):
         pass
     
     @abstractmethod
-    def get_active_recordings(self) -> Dict[str, RecordingSession]:
-        """Get all active recording sessions."""
+    def get_active_recordings(self) -> Mapping[str, RecordingSession]:
+        """Get a read-only view of all active recording sessions."""
         pass
     
     @abstractmethod
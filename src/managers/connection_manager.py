@@ -2,21 +2,29 @@
 Connection Manager implementation for handling WebSocket connections.
 """
 
+import asyncio
 import logging
-from typing import Dict, Optional
-from aiohttp import web_ws
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+from aiohttp import WSMsgType, web_ws
 
 from src.interfaces import IConnectionManager
 from src.models import User
 
 logger = logging.getLogger(__name__)
 
+_EMPTY_ROOM: Mapping[str, User] = MappingProxyType({})
+
 
 class ConnectionManager(IConnectionManager):
     """Manages WebSocket connections and user lifecycle."""
     
     def __init__(self):
         self._connections: Dict[str, User] = {}
+        self._connections_view: Mapping[str, User] = MappingProxyType(self._connections)
+        # Secondary index: room_id -> {user_id: User}
+        self._room_index: Dict[str, Dict[str, User]] = {}
+        self._users_in_rooms = 0
         logger.info("ConnectionManager initialized")
     
     async def add_connection(self, user_id: str, websocket: web_ws.WebSocketResponse) -> User:
@@ -28,49 +36,71 @@ class ConnectionManager(IConnectionManager):
     
     async def remove_connection(self, user_id: str) -> None:
         """Remove a user connection and cleanup resources."""
-        if user_id not in self._connections:
+        user = self._connections.pop(user_id, None)
+        if user is None:
             logger.warning(f"Attempted to remove non-existent connection: {user_id}")
             return
         
-        user = self._connections[user_id]
+        user.disconnected = True
+        
+        # Drop the user from the room index
+        self._move_user(user, None)
         
         # Clean up user resources
         await self.cleanup_user_resources(user)
         
-        # Remove from connections
-        del self._connections[user_id]
         logger.info(f"Removed connection: {user_id}")
     
+    def mark_disconnected(self, user_id: str) -> None:
+        """Flag a user as disconnected so pending sends to it are skipped."""
+        user = self._connections.get(user_id)
+        if user:
+            user.disconnected = True
+    
     def get_user(self, user_id: str) -> Optional[User]:
         """Get a user by ID."""
         return self._connections.get(user_id)
     
-    def get_all_users(self) -> Dict[str, User]:
-        """Get all connected users."""
+    def get_all_users(self) -> Mapping[str, User]:
+        """Get a read-only live view of all connected users."""
+        return self._connections_view
+    
+    def snapshot(self) -> Dict[str, User]:
+        """Get a copy of all connected users that is safe to hold across mutations."""
         return self._connections.copy()
     
     async def cleanup_user_resources(self, user: User) -> None:
         """Clean up all resources associated with a user."""
         try:
-            # Close all peer connections
-            for target_id, pc in user.peer_connections.items():
-                try:
-                    await pc.close()
+            # Peer connections are normally released through the WebRTC manager
+            # before this point; anything left here is closed as a last resort
+            peers = list(user.peer_connections.items())
+            if peers:
+                logger.warning(f"User {user.id} still has {len(peers)} peer connections at removal")
+            
+            # Close any remaining peer connections and the WebSocket concurrently
+            coros = [pc.close() for _, pc in peers]
+            close_websocket = not user.websocket.closed
+            if close_websocket:
+                coros.append(user.websocket.close())
+            
+            results = await asyncio.gather(*coros, return_exceptions=True)
+            
+            for (target_id, _), result in zip(peers, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error closing peer connection from {user.id} to {target_id}: {result}")
+                else:
                     logger.debug(f"Closed peer connection from {user.id} to {target_id}")
-                except Exception as e:
-                    logger.error(f"Error closing peer connection from {user.id} to {target_id}: {e}")
+            
+            if close_websocket:
+                if isinstance(results[-1], Exception):
+                    logger.error(f"Error closing WebSocket for user {user.id}: {results[-1]}")
+                else:
+                    logger.debug(f"Closed WebSocket for user {user.id}")
             
             # Clear peer connections
             user.peer_connections.clear()
             
-            # Close WebSocket if still open
-            if not user.websocket.closed:
-                try:
-                    await user.websocket.close()
-                    logger.debug(f"Closed WebSocket for user {user.id}")
-                except Exception as e:
-                    logger.error(f"Error closing WebSocket for user {user.id}: {e}")
-            
             logger.info(f"Cleaned up resources for user: {user.id}")
             
         except Exception as e:
@@ -80,12 +110,64 @@ class ConnectionManager(IConnectionManager):
         """Get the total number of active connections."""
         return len(self._connections)
     
-    def get_users_in_room(self, room_id: str) -> Dict[str, User]:
-        """Get all users currently in a specific room."""
-        return {
-            user_id: user for user_id, user in self._connections.items()
-            if user.room_id == room_id
-        }
+    def set_user_room(self, user_id: str, room_id: Optional[str]) -> None:
+        """Move a user to a room (or out of any room when room_id is None)."""
+        user = self._connections.get(user_id)
+        if user:
+            self._move_user(user, room_id)
+    
+    def _move_user(self, user: User, room_id: Optional[str]) -> None:
+        """Update the room index and user.room_id for a resolved user."""
+        old_room_id = user.room_id
+        if old_room_id == room_id:
+            return
+        
+        if old_room_id is not None:
+            bucket = self._room_index.get(old_room_id)
+            if bucket is not None:
+                bucket.pop(user.id, None)
+                if not bucket:
+                    del self._room_index[old_room_id]
+            self._users_in_rooms -= 1
+        
+        if room_id is not None:
+            self._room_index.setdefault(room_id, {})[user.id] = user
+            self._users_in_rooms += 1
+        
+        user.room_id = room_id
+    
+    def get_users_in_room(self, room_id: str) -> Mapping[str, User]:
+        """Get a read-only view of all users currently in a specific room."""
+        bucket = self._room_index.get(room_id)
+        return MappingProxyType(bucket) if bucket else _EMPTY_ROOM
+    
+    async def broadcast_bytes(self, room_id: str, payload: bytes, exclude: Optional[str] = None) -> int:
+        """Send a pre-serialized UTF-8 JSON payload to every user in a room.
+        
+        The same bytes are framed as a text message for each peer, and all
+        writes are issued together. Closed or disconnecting sockets are
+        filtered out up front, so only genuine send failures reach the
+        error log. Returns the number of users reached.
+        """
+        # Snapshot the recipients before the first await so joins and leaves
+        # during the fan-out cannot mutate the sequence being sent to
+        users = tuple(
+            user for user_id, user in self._room_index.get(room_id, _EMPTY_ROOM).items()
+            if user_id != exclude and user.is_sendable()
+        )
+        results = await asyncio.gather(
+            *(user.websocket.send_frame(payload, WSMsgType.TEXT) for user in users),
+            return_exceptions=True
+        )
+        
+        sent_count = 0
+        for user, result in zip(users, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error broadcasting to {user.id}: {result}")
+            else:
+                sent_count += 1
+        
+        return sent_count
     
     async def is_user_connected(self, user_id: str) -> bool:
         """Check if a user is currently connected."""
@@ -99,7 +181,7 @@ class ConnectionManager(IConnectionManager):
     def get_stats(self) -> Dict[str, int]:
         """Get connection statistics."""
         total_connections = len(self._connections)
-        users_in_rooms = sum(1 for user in self._connections.values() if user.room_id)
+        users_in_rooms = self._users_in_rooms
         users_without_rooms = total_connections - users_in_rooms
         
         return {
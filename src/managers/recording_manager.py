@@ -2,15 +2,21 @@
 Recording Manager implementation for handling recording sessions.
 """
 
+import os
+import time
 import logging
 from datetime import datetime
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
 
 from src.interfaces import IStorageManager, IRoomManager, IRecordingManager
 from src.models import RecordingSession
 
 logger = logging.getLogger(__name__)
 
+# Common recording file types
+_RECORDING_EXTS: Tuple[str, ...] = ('.mp4', '.webm', '.wav', '.mp3', '.ogg', '.m4a')
+
 
 class RecordingManager(IRecordingManager):
     """Manages recording sessions for rooms."""
@@ -19,7 +25,11 @@ class RecordingManager(IRecordingManager):
         self.storage_manager = storage_manager
         self.room_manager = room_manager
         self._active_recordings: Dict[str, RecordingSession] = {}
+        self._active_recordings_view: Mapping[str, RecordingSession] = MappingProxyType(self._active_recordings)
+        self._active_by_session: Dict[str, RecordingSession] = {}
         self._recording_history: Dict[str, RecordingSession] = {}
+        # Running total of durations in _recording_history, kept in sync on insert/evict
+        self._total_duration_seconds = 0.0
         logger.info("RecordingManager initialized")
     
     async def start_recording(self, room_id: str) -> str:
@@ -44,6 +54,7 @@ class RecordingManager(IRecordingManager):
         
         # Add to active recordings
         self._active_recordings[room_id] = recording
+        self._active_by_session[recording.session_id] = recording
         
         # Ensure session folder exists
         await self.storage_manager.session_manager.create_session_folder(room.session_id)
@@ -53,18 +64,19 @@ class RecordingManager(IRecordingManager):
     
     async def stop_recording(self, room_id: str) -> Optional[RecordingSession]:
         """Stop recording for a room and return the recording session."""
-        if room_id not in self._active_recordings:
+        recording = self._active_recordings.pop(room_id, None)
+        if recording is None:
             logger.warning(f"No active recording found for room {room_id}")
             return None
         
-        # Get and update recording session
-        recording = self._active_recordings[room_id]
+        # Update recording session
+        recording.ended_mono = time.monotonic()
         recording.ended_at = datetime.now()
         recording.status = "stopped"
         
         # Move from active to history
-        del self._active_recordings[room_id]
-        self._recording_history[recording.session_id] = recording
+        self._active_by_session.pop(recording.session_id, None)
+        self._add_to_history(recording)
         
         logger.info(f"Stopped recording for room {room_id}, session {recording.session_id}")
         logger.info(f"Recording duration: {recording.duration:.2f} seconds")
@@ -79,7 +91,6 @@ class RecordingManager(IRecordingManager):
             # Update recording session files list
             recording = await self.get_recording_session(session_id)
             if recording:
-                import os
                 recording.files.append(os.path.basename(filepath))
             
             logger.info(f"Saved recording file: {filepath}")
@@ -89,26 +100,28 @@ class RecordingManager(IRecordingManager):
             logger.error(f"Error saving recording for session {session_id}: {e}")
             
             # Mark recording as error if it exists in active recordings
-            for recording in self._active_recordings.values():
-                if recording.session_id == session_id:
-                    recording.status = "error"
-                    break
+            recording = self._active_by_session.get(session_id)
+            if recording:
+                recording.status = "error"
             
             raise
     
-    def get_active_recordings(self) -> Dict[str, RecordingSession]:
-        """Get all active recording sessions."""
-        return self._active_recordings.copy()
+    def _add_to_history(self, recording: RecordingSession) -> None:
+        """Store a finished recording in history and update the duration total."""
+        previous = self._recording_history.get(recording.session_id)
+        if previous and previous.duration:
+            self._total_duration_seconds -= previous.duration
+        
+        self._recording_history[recording.session_id] = recording
+        self._total_duration_seconds += recording.duration or 0.0
+    
+    def get_active_recordings(self) -> Mapping[str, RecordingSession]:
+        """Get a read-only live view of all active recording sessions."""
+        return self._active_recordings_view
     
     async def get_recording_session(self, session_id: str) -> Optional[RecordingSession]:
         """Get a recording session by session ID."""
-        # Check active recordings first
-        for recording in self._active_recordings.values():
-            if recording.session_id == session_id:
-                return recording
-        
-        # Check recording history
-        return self._recording_history.get(session_id)
+        return self._active_by_session.get(session_id) or self._recording_history.get(session_id)
     
     def is_room_recording(self, room_id: str) -> bool:
         """Check if a room is currently being recorded."""
@@ -120,16 +133,17 @@ class RecordingManager(IRecordingManager):
     
     async def force_stop_recording(self, room_id: str, reason: str = "forced") -> Optional[RecordingSession]:
         """Force stop a recording session with a reason."""
-        if room_id not in self._active_recordings:
+        recording = self._active_recordings.pop(room_id, None)
+        if recording is None:
             return None
         
-        recording = self._active_recordings[room_id]
+        recording.ended_mono = time.monotonic()
         recording.ended_at = datetime.now()
         recording.status = f"stopped ({reason})"
         
         # Move to history
-        del self._active_recordings[room_id]
-        self._recording_history[recording.session_id] = recording
+        self._active_by_session.pop(recording.session_id, None)
+        self._add_to_history(recording)
         
         logger.warning(f"Force stopped recording for room {room_id}: {reason}")
         return recording
@@ -147,20 +161,13 @@ class RecordingManager(IRecordingManager):
             return None
         
         recording = self._active_recordings[room_id]
-        current_time = datetime.now()
-        return (current_time - recording.started_at).total_seconds()
+        return time.monotonic() - recording.started_mono
     
     async def get_session_recording_files(self, session_id: str) -> list:
         """Get list of recording files for a session."""
         try:
             files = await self.storage_manager.get_session_files(session_id)
-            # Filter for common recording file types
-            recording_extensions = ['.mp4', '.webm', '.wav', '.mp3', '.ogg', '.m4a']
-            recording_files = [
-                f for f in files 
-                if any(f.lower().endswith(ext) for ext in recording_extensions)
-            ]
-            return recording_files
+            return [f for f in files if f.lower().endswith(_RECORDING_EXTS)]
         except Exception as e:
             logger.error(f"Error getting recording files for session {session_id}: {e}")
             return []
@@ -170,11 +177,7 @@ class RecordingManager(IRecordingManager):
         total_recordings = len(self._recording_history)
         active_recordings = len(self._active_recordings)
         
-        # Calculate total recording time
-        total_duration = 0
-        for recording in self._recording_history.values():
-            if recording.duration:
-                total_duration += recording.duration
+        total_duration = self._total_duration_seconds
         
         # Calculate average recording duration
         avg_duration = total_duration / total_recordings if total_recordings > 0 else 0
@@ -191,17 +194,20 @@ class RecordingManager(IRecordingManager):
         if days_old <= 0:
             return 0
         
-        cleaned_count = 0
         cutoff_time = datetime.now().timestamp() - (days_old * 24 * 60 * 60)
         
-        sessions_to_remove = []
+        # Rebuild history in one pass, keeping only recent sessions
+        kept = {}
+        evicted_duration = 0.0
         for session_id, recording in self._recording_history.items():
             if recording.ended_at and recording.ended_at.timestamp() < cutoff_time:
-                sessions_to_remove.append(session_id)
+                evicted_duration += recording.duration or 0.0
+            else:
+                kept[session_id] = recording
         
-        for session_id in sessions_to_remove:
-            del self._recording_history[session_id]
-            cleaned_count += 1
+        cleaned_count = len(self._recording_history) - len(kept)
+        self._recording_history = kept
+        self._total_duration_seconds -= evicted_duration
         
         if cleaned_count > 0:
             logger.info(f"Cleaned up {cleaned_count} old recording sessions")
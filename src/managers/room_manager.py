@@ -3,7 +3,7 @@ Room Manager implementation for handling chat rooms.
 """
 
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 
 from src.interfaces import IConnectionManager, IRoomManager
 from src.models import Room
@@ -13,18 +13,35 @@ logger = logging.getLogger(__name__)
 
 
 class RoomManager(IRoomManager):
-    """Manages chat rooms and user room membership."""
+    """Manages chat rooms and user room membership.
+    
+    All state is owned by the event loop thread. The mutating coroutines
+    (create_room, join_room, leave_room, cleanup_room) never await anything
+    that suspends while the indexes and counters are being updated, so each
+    update is atomic without a lock, and readers can stay synchronous.
+    Keep it that way: an await that can suspend in the middle of a mutation
+    requires introducing a lock around the mutating paths.
+    """
     
     def __init__(self, connection_manager: IConnectionManager):
         self._rooms: Dict[str, Room] = {}
+        # Reverse index: user_id -> room_id
+        self._user_room: Dict[str, str] = {}
+        # Aggregate counters for get_stats, updated via _account()
+        self._full_rooms = 0
+        self._empty_rooms = 0
+        self._total_users = 0
+        # IDs of rooms that still have a free seat
+        self._available: Set[str] = set()
         self._connection_manager = connection_manager
         logger.info("RoomManager initialized")
     
     async def create_room(self, room_id: str, max_users: int = MAX_USERS_PER_ROOM) -> Room:
         """Create a new room or return existing one."""
         if room_id not in self._rooms:
-            room = Room(id=room_id, users=[], max_users=max_users)
+            room = Room(id=room_id, max_users=max_users)
             self._rooms[room_id] = room
+            self._account(room, 1)
             logger.info(f"Created room: {room_id} with session: {room.session_id} (max users: {max_users})")
         else:
             logger.debug(f"Room {room_id} already exists")
@@ -38,12 +55,18 @@ class RoomManager(IRoomManager):
             logger.warning(f"User {user_id} not found when trying to join room {room_id}")
             return False
         
+        # Re-joining the current room is a no-op; going through leave_room
+        # would delete the room if the user is its only member
+        if self._user_room.get(user_id) == room_id:
+            logger.debug(f"User {user_id} already in room {room_id}")
+            return True
+        
         # Create room if it doesn't exist
         await self.create_room(room_id)
         room = self._rooms[room_id]
         
         # Check room capacity
-        if room.is_full and user_id not in room.users:
+        if room.is_full:
             logger.warning(f"Room {room_id} is full ({room.user_count}/{room.max_users})")
             return False
         
@@ -52,44 +75,59 @@ class RoomManager(IRoomManager):
         if old_room_id:
             logger.info(f"User {user_id} left room {old_room_id} to join {room_id}")
         
-        # Join new room (if not already in it)
-        if user_id not in room.users:
-            room.users.append(user_id)
-            user.room_id = room_id
-            logger.info(f"User {user_id} joined room {room_id} ({room.user_count}/{room.max_users})")
-        else:
-            logger.debug(f"User {user_id} already in room {room_id}")
+        # Join new room
+        self._account(room, -1)
+        room.users.add(user_id)
+        self._account(room, 1)
+        self._user_room[user_id] = room_id
+        self._connection_manager.set_user_room(user_id, room_id)
+        logger.info(f"User {user_id} joined room {room_id} ({room.user_count}/{room.max_users})")
         
         return True
     
     async def leave_room(self, user_id: str) -> Optional[str]:
         """Remove a user from their current room. Returns the room ID they left."""
-        user = self._connection_manager.get_user(user_id)
-        if not user or not user.room_id:
+        room_id = self._user_room.pop(user_id, None)
+        if room_id is None:
             return None
         
-        room_id = user.room_id
+        # Keep user.room_id in sync for the rest of the codebase
+        self._connection_manager.set_user_room(user_id, None)
         room = self._rooms.get(room_id)
         
         if room and user_id in room.users:
-            room.users.remove(user_id)
-            user.room_id = None
+            self._account(room, -1)
+            room.users.discard(user_id)
             
             logger.info(f"User {user_id} left room {room_id} ({room.user_count}/{room.max_users} remaining)")
             
             # Clean up empty rooms
             if not room.users:
-                del self._rooms[room_id]
+                self._rooms.pop(room_id, None)
                 logger.info(f"Deleted empty room: {room_id}")
+            else:
+                self._account(room, 1)
             
             return room_id
         
-        # Clean up user state even if room doesn't exist
-        if user:
-            user.room_id = None
-        
         return None
     
+    def _account(self, room: Room, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) a room's contribution to the stats counters
+        and the available-rooms index.
+        
+        Mutations call this with -1 before changing a room and with 1 afterwards.
+        """
+        self._total_users += sign * room.user_count
+        if room.is_full:
+            self._full_rooms += sign
+        elif sign > 0:
+            self._available.add(room.id)
+        else:
+            self._available.discard(room.id)
+        if not room.users:
+            self._empty_rooms += sign
+    
     def get_room(self, room_id: str) -> Optional[Room]:
         """Get a room by ID."""
         return self._rooms.get(room_id)
@@ -97,7 +135,7 @@ class RoomManager(IRoomManager):
     def get_room_users(self, room_id: str) -> List[str]:
         """Get list of user IDs in a room."""
         room = self.get_room(room_id)
-        return room.users.copy() if room else []
+        return list(room.users) if room else []
     
     def get_all_rooms(self) -> Dict[str, Room]:
         """Get all rooms."""
@@ -105,8 +143,7 @@ class RoomManager(IRoomManager):
     
     def get_user_room_id(self, user_id: str) -> Optional[str]:
         """Get the room ID that a user is currently in."""
-        user = self._connection_manager.get_user(user_id)
-        return user.room_id if user else None
+        return self._user_room.get(user_id)
     
     def is_room_full(self, room_id: str) -> bool:
         """Check if a room is at capacity."""
@@ -115,7 +152,7 @@ class RoomManager(IRoomManager):
     
     def get_available_rooms(self) -> List[Room]:
         """Get all rooms that are not at capacity."""
-        return [room for room in self._rooms.values() if not room.is_full]
+        return [self._rooms[room_id] for room_id in self._available]
     
     def get_room_count(self) -> int:
         """Get the total number of rooms."""
@@ -124,9 +161,9 @@ class RoomManager(IRoomManager):
     def get_stats(self) -> Dict[str, any]:
         """Get room statistics."""
         total_rooms = len(self._rooms)
-        full_rooms = sum(1 for room in self._rooms.values() if room.is_full)
-        empty_rooms = sum(1 for room in self._rooms.values() if not room.users)
-        total_users_in_rooms = sum(len(room.users) for room in self._rooms.values())
+        full_rooms = self._full_rooms
+        empty_rooms = self._empty_rooms
+        total_users_in_rooms = self._total_users
         
         return {
             "total_rooms": total_rooms,
@@ -144,13 +181,14 @@ class RoomManager(IRoomManager):
             return False
         
         # Remove all users from the room
-        users_to_remove = room.users.copy()
+        users_to_remove = list(room.users)
         for user_id in users_to_remove:
             await self.leave_room(user_id)
         
         # Remove the room
-        if room_id in self._rooms:
-            del self._rooms[room_id]
+        room = self._rooms.pop(room_id, None)
+        if room is not None:
+            self._account(room, -1)
             logger.info(f"Force cleaned up room: {room_id}")
             return True
         
@@ -4,8 +4,9 @@ Session Manager implementation for handling session folders.
 
 import os
 import shutil
+import asyncio
 import logging
-from typing import Set
+from typing import Dict, Set
 
 from src.interfaces import ISessionManager
 from src.config import SESSIONS_BASE_PATH
@@ -13,12 +14,37 @@ from src.config import SESSIONS_BASE_PATH
 logger = logging.getLogger(__name__)
 
 
+def _tree_size(path: str) -> int:
+    """Sum the sizes of all regular files under path using os.scandir."""
+    total_size = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total_size += _tree_size(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total_size += entry.stat(follow_symlinks=False).st_size
+    return total_size
+
+
+def _tree_file_count(path: str) -> int:
+    """Count all regular files under path without stat-ing them."""
+    file_count = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                file_count += _tree_file_count(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                file_count += 1
+    return file_count
+
+
 class SessionManager(ISessionManager):
     """Manages session folders and their lifecycle."""
     
     def __init__(self, base_path: str = SESSIONS_BASE_PATH):
         self.base_path = base_path
         self._active_sessions: Set[str] = set()
+        self._paths: Dict[str, str] = {}
         
         # Create base directory if it doesn't exist
         if not os.path.exists(base_path):
@@ -43,18 +69,26 @@ class SessionManager(ISessionManager):
         except Exception as e:
             logger.error(f"Error loading existing sessions: {e}")
     
+    def _path(self, session_id: str) -> str:
+        """Get the folder path for a session, memoized per session ID."""
+        path = self._paths.get(session_id)
+        if path is None:
+            path = self._paths[session_id] = os.path.join(self.base_path, session_id)
+        return path
+    
     async def create_session_folder(self, session_id: str) -> str:
         """Create a folder for a session and return the path."""
-        session_path = os.path.join(self.base_path, session_id)
+        session_path = self._path(session_id)
+        
+        # Known sessions already have a folder; skip the filesystem entirely
+        if session_id in self._active_sessions:
+            logger.debug(f"Session folder already exists: {session_path}")
+            return session_path
         
         try:
-            if not os.path.exists(session_path):
-                os.makedirs(session_path, exist_ok=True)
-                self._active_sessions.add(session_id)
-                logger.info(f"Created session folder: {session_path}")
-            else:
-                logger.debug(f"Session folder already exists: {session_path}")
-            
+            await asyncio.to_thread(os.makedirs, session_path, exist_ok=True)
+            self._active_sessions.add(session_id)
+            logger.info(f"Created session folder: {session_path}")
             return session_path
             
         except Exception as e:
@@ -63,33 +97,39 @@ class SessionManager(ISessionManager):
     
     async def get_session_path(self, session_id: str) -> str:
         """Get the path for a session, creating it if needed."""
-        session_path = os.path.join(self.base_path, session_id)
-        
-        if not os.path.exists(session_path):
-            return await self.create_session_folder(session_id)
-        
-        return session_path
+        return await self.create_session_folder(session_id)
     
     async def session_exists(self, session_id: str) -> bool:
-        """Check if a session folder exists."""
-        session_path = os.path.join(self.base_path, session_id)
-        return os.path.exists(session_path) and os.path.isdir(session_path)
+        """Check if a session folder exists, according to the tracked sessions."""
+        return session_id in self._active_sessions
+    
+    async def verify_session_exists(self, session_id: str) -> bool:
+        """Check the filesystem for a session folder and reconcile the tracked sessions."""
+        exists = await asyncio.to_thread(os.path.isdir, self._path(session_id))
+        if exists:
+            self._active_sessions.add(session_id)
+        else:
+            self._active_sessions.discard(session_id)
+        return exists
     
     async def cleanup_session(self, session_id: str) -> bool:
         """Clean up a session folder and its contents."""
         try:
-            session_path = os.path.join(self.base_path, session_id)
+            session_path = self._path(session_id)
             
-            if os.path.exists(session_path):
+            try:
                 # Remove the entire directory and its contents
-                shutil.rmtree(session_path)
-                self._active_sessions.discard(session_id)
-                logger.info(f"Cleaned up session folder: {session_path}")
-                return True
-            else:
+                await asyncio.to_thread(shutil.rmtree, session_path)
+            except FileNotFoundError:
                 logger.warning(f"Session folder does not exist: {session_path}")
                 self._active_sessions.discard(session_id)
+                self._paths.pop(session_id, None)
                 return False
+            
+            self._active_sessions.discard(session_id)
+            self._paths.pop(session_id, None)
+            logger.info(f"Cleaned up session folder: {session_path}")
+            return True
                 
         except Exception as e:
             logger.error(f"Error cleaning up session {session_id}: {e}")
@@ -105,35 +145,20 @@ class SessionManager(ISessionManager):
     
     async def get_session_size(self, session_id: str) -> int:
         """Get the total size of a session folder in bytes."""
-        session_path = os.path.join(self.base_path, session_id)
-        
-        if not os.path.exists(session_path):
-            return 0
-        
-        total_size = 0
         try:
-            for dirpath, dirnames, filenames in os.walk(session_path):
-                for filename in filenames:
-                    file_path = os.path.join(dirpath, filename)
-                    if os.path.exists(file_path):
-                        total_size += os.path.getsize(file_path)
-            return total_size
+            return await asyncio.to_thread(_tree_size, self._path(session_id))
+        except FileNotFoundError:
+            return 0
         except Exception as e:
             logger.error(f"Error calculating session size for {session_id}: {e}")
             return 0
     
     async def get_session_file_count(self, session_id: str) -> int:
         """Get the number of files in a session folder."""
-        session_path = os.path.join(self.base_path, session_id)
-        
-        if not os.path.exists(session_path):
-            return 0
-        
         try:
-            file_count = 0
-            for dirpath, dirnames, filenames in os.walk(session_path):
-                file_count += len(filenames)
-            return file_count
+            return await asyncio.to_thread(_tree_file_count, self._path(session_id))
+        except FileNotFoundError:
+            return 0
         except Exception as e:
             logger.error(f"Error counting files in session {session_id}: {e}")
             return 0
@@ -143,16 +168,20 @@ class SessionManager(ISessionManager):
         cleaned_count = 0
         
         try:
-            sessions_to_cleanup = []
-            
-            for session_id in self._active_sessions.copy():
-                file_count = await self.get_session_file_count(session_id)
-                if file_count == 0:
-                    sessions_to_cleanup.append(session_id)
+            # Count files in every session concurrently
+            session_ids = list(self._active_sessions)
+            file_counts = await asyncio.gather(
+                *(self.get_session_file_count(session_id) for session_id in session_ids)
+            )
+            sessions_to_cleanup = [
+                session_id for session_id, file_count in zip(session_ids, file_counts)
+                if file_count == 0
+            ]
             
-            for session_id in sessions_to_cleanup:
-                if await self.cleanup_session(session_id):
-                    cleaned_count += 1
+            results = await asyncio.gather(
+                *(self.cleanup_session(session_id) for session_id in sessions_to_cleanup)
+            )
+            cleaned_count = sum(1 for cleaned in results if cleaned)
             
             if cleaned_count > 0:
                 logger.info(f"Cleaned up {cleaned_count} empty session folders")
@@ -3,10 +3,11 @@ Storage Manager implementation for handling file operations.
 """
 
 import os
-import uuid
+import asyncio
+import secrets
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import AsyncIterable, BinaryIO, List, Optional, Tuple
 
 from src.interfaces import ISessionManager, IStorageManager
 from src.config import MAX_FILE_SIZE, ALLOWED_EXTENSIONS
@@ -14,13 +15,77 @@ from src.config import MAX_FILE_SIZE, ALLOWED_EXTENSIONS
 logger = logging.getLogger(__name__)
 
 
+def _open_upload(filepath: str) -> BinaryIO:
+    """Open a session file for writing, recreating its folder if it was removed.
+    
+    Session folders are tracked in memory once created, so one deleted
+    outside this process (by an operator or another worker) is only noticed here.
+    """
+    try:
+        return open(filepath, 'wb')
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        return open(filepath, 'wb')
+
+
+def _write_file(filepath: str, data: bytes) -> None:
+    """Write bytes to a file (blocking; run in a worker thread)."""
+    with _open_upload(filepath) as f:
+        f.write(data)
+
+
+def _discard_upload(f: BinaryIO, filepath: str) -> None:
+    """Close and delete a partially written upload."""
+    f.close()
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+
+def _list_files(path: str) -> List[str]:
+    """List regular files directly inside path, sorted (blocking; run in a worker thread)."""
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entry.name for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return []
+
+
+def _scan_file_details(path: str) -> List[dict]:
+    """Collect file metadata for a folder in a single scandir pass, sorted by name."""
+    file_details = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                file_details.append({
+                    "filename": entry.name,
+                    "filepath": entry.path,
+                    "size": stat.st_size,
+                    "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                    "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                    "extension": os.path.splitext(entry.name)[1].lower()
+                })
+    except FileNotFoundError:
+        return []
+    
+    file_details.sort(key=lambda info: info["filename"])
+    return file_details
+
+
 class StorageManager(IStorageManager):
     """Manages file storage operations within session folders."""
     
     def __init__(self, session_manager: ISessionManager):
         self.session_manager = session_manager
         self.max_file_size = MAX_FILE_SIZE
-        self.allowed_extensions = ALLOWED_EXTENSIONS
+        # Frozensets make extension validation a single hash lookup
+        self.allowed_extensions = {
+            file_type: frozenset(extensions) for file_type, extensions in ALLOWED_EXTENSIONS.items()
+        }
         logger.info("StorageManager initialized")
     
     async def save_file(self, session_id: str, filename: str, data: bytes) -> str:
@@ -37,9 +102,8 @@ class StorageManager(IStorageManager):
         filepath = os.path.join(session_path, unique_filename)
         
         try:
-            # Write file to disk
-            with open(filepath, 'wb') as f:
-                f.write(data)
+            # Write file to disk without blocking the event loop
+            await asyncio.to_thread(_write_file, filepath, data)
             
             logger.info(f"File saved: {filepath} ({len(data)} bytes)")
             return filepath
@@ -48,19 +112,45 @@ class StorageManager(IStorageManager):
             logger.error(f"Error saving file {filepath}: {e}")
             raise
     
+    async def save_stream(self, session_id: str, filename: str,
+                          chunks: AsyncIterable[bytes]) -> Tuple[str, int]:
+        """Stream chunks to a file in the session folder. Returns the file path and size.
+        
+        The size limit is enforced as data arrives, so oversized uploads are
+        rejected without being buffered or fully written.
+        """
+        session_path = await self.session_manager.get_session_path(session_id)
+        
+        # Generate unique filename
+        unique_filename = self._generate_unique_filename(filename)
+        filepath = os.path.join(session_path, unique_filename)
+        
+        total_size = 0
+        f = await asyncio.to_thread(_open_upload, filepath)
+        try:
+            async for chunk in chunks:
+                total_size += len(chunk)
+                if total_size > self.max_file_size:
+                    raise ValueError(f"File size exceeds maximum allowed size ({self.max_file_size} bytes)")
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException as e:
+            await asyncio.to_thread(_discard_upload, f, filepath)
+            if not isinstance(e, ValueError):
+                logger.error(f"Error saving file {filepath}: {e}")
+            raise
+        
+        await asyncio.to_thread(f.close)
+        
+        logger.info(f"File saved: {filepath} ({total_size} bytes)")
+        return filepath, total_size
+    
     async def get_session_files(self, session_id: str) -> List[str]:
         """Get list of files in a session folder."""
         session_path = await self.session_manager.get_session_path(session_id)
         
         try:
-            if os.path.exists(session_path):
-                files = []
-                for item in os.listdir(session_path):
-                    item_path = os.path.join(session_path, item)
-                    if os.path.isfile(item_path):
-                        files.append(item)
-                return sorted(files)  # Sort for consistent ordering
-            return []
+            # Sorted for consistent ordering
+            return await asyncio.to_thread(_list_files, session_path)
         except Exception as e:
             logger.error(f"Error listing files in session {session_id}: {e}")
             return []
@@ -70,7 +160,7 @@ class StorageManager(IStorageManager):
         session_path = await self.session_manager.get_session_path(session_id)
         filepath = os.path.join(session_path, filename)
         
-        if os.path.exists(filepath) and os.path.isfile(filepath):
+        if await asyncio.to_thread(os.path.isfile, filepath):
             return filepath
         return None
     
@@ -79,7 +169,7 @@ class StorageManager(IStorageManager):
         try:
             filepath = await self.get_file_path(session_id, filename)
             if filepath:
-                os.remove(filepath)
+                await asyncio.to_thread(os.remove, filepath)
                 logger.info(f"Deleted file: {filepath}")
                 return True
             else:
@@ -94,7 +184,7 @@ class StorageManager(IStorageManager):
         return await self.session_manager.get_session_size(session_id)
     
     def _generate_unique_filename(self, original_filename: str) -> str:
-        """Generate a unique filename with timestamp and UUID."""
+        """Generate a unique filename with timestamp and random suffix."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Split filename and extension
@@ -104,7 +194,7 @@ class StorageManager(IStorageManager):
             base_name, ext = original_filename, ''
         
         # Generate unique identifier
-        unique_id = str(uuid.uuid4())[:8]
+        unique_id = secrets.token_hex(4)
         
         # Create unique filename
         unique_filename = f"{base_name}_{timestamp}_{unique_id}{ext}"
@@ -126,7 +216,7 @@ class StorageManager(IStorageManager):
             return None
         
         try:
-            stat = os.stat(filepath)
+            stat = await asyncio.to_thread(os.stat, filepath)
             return {
                 "filename": filename,
                 "filepath": filepath,
@@ -141,15 +231,13 @@ class StorageManager(IStorageManager):
     
     async def get_session_file_details(self, session_id: str) -> List[dict]:
         """Get detailed information about all files in a session."""
-        files = await self.get_session_files(session_id)
-        file_details = []
-        
-        for filename in files:
-            info = await self.get_file_info(session_id, filename)
-            if info:
-                file_details.append(info)
+        session_path = await self.session_manager.get_session_path(session_id)
         
-        return file_details
+        try:
+            return await asyncio.to_thread(_scan_file_details, session_path)
+        except Exception as e:
+            logger.error(f"Error getting file details for session {session_id}: {e}")
+            return []
     
     async def cleanup_old_files(self, session_id: str, days_old: int = 7) -> int:
         """Clean up files older than specified days. Returns number of files deleted."""
@@ -165,7 +253,7 @@ class StorageManager(IStorageManager):
             for filename in files:
                 filepath = await self.get_file_path(session_id, filename)
                 if filepath:
-                    stat = os.stat(filepath)
+                    stat = await asyncio.to_thread(os.stat, filepath)
                     if stat.st_mtime < cutoff_time:
                         if await self.delete_file(session_id, filename):
                             deleted_count += 1
@@ -182,5 +270,5 @@ class StorageManager(IStorageManager):
         """Get storage statistics."""
         return {
             "max_file_size": self.max_file_size,
-            "allowed_extensions": self.allowed_extensions
+            "allowed_extensions": ALLOWED_EXTENSIONS
         }
\ No newline at end of file
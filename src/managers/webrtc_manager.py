@@ -2,13 +2,19 @@
 WebRTC Manager implementation for handling peer-to-peer connections.
 """
 
-import json
+import asyncio
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from aiohttp import WSMsgType
 
-from aiortc import RTCPeerConnection
 from src.interfaces import IConnectionManager, IWebRTCManager
-from src.config import ICE_SERVERS
+from src.models import User
+from src.config import ICE_SERVERS, SIGNALING_FLUSH_INTERVAL, SIGNALING_BATCH_SIZE
+
+if TYPE_CHECKING:
+    from aiortc import RTCPeerConnection
 
 logger = logging.getLogger(__name__)
 
@@ -19,22 +25,37 @@ class WebRTCManager(IWebRTCManager):
     def __init__(self, connection_manager: IConnectionManager):
         self.connection_manager = connection_manager
         self.ice_servers = ICE_SERVERS
+        
+        # Outbound signalling messages waiting to be flushed, per target user
+        self._outbox: Dict[str, List[dict]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Flushes started by the timer, kept referenced until they finish
+        self._flush_tasks: Set[asyncio.Task] = set()
+        
+        # Peer connection counters, maintained by _add_peer/_remove_peer
+        self._pc_count = 0
+        self._users_with_conns: Set[str] = set()
         logger.info(f"WebRTCManager initialized with ICE servers: {self.ice_servers}")
     
-    async def create_peer_connection(self, user_id: str, target_id: str) -> RTCPeerConnection:
+    async def create_peer_connection(self, user_id: str, target_id: str) -> "RTCPeerConnection":
         """Create a peer connection between two users."""
         user = self.connection_manager.get_user(user_id)
         if not user:
             raise ValueError(f"User {user_id} not found")
         
         # Check if connection already exists
-        if target_id in user.peer_connections:
+        existing = user.peer_connections.get(target_id)
+        if existing is not None:
             logger.debug(f"Peer connection already exists between {user_id} and {target_id}")
-            return user.peer_connections[target_id]
+            return existing
+        
+        # Import aiortc on first use so processes that never negotiate
+        # media do not pay for loading its native libraries
+        from aiortc import RTCPeerConnection
         
         # Create new peer connection
         pc = RTCPeerConnection(configuration={"iceServers": self.ice_servers})
-        user.peer_connections[target_id] = pc
+        self._add_peer(user, target_id, pc)
         
         # Set up event handlers
         await self._setup_peer_connection_handlers(pc, user_id, target_id)
@@ -42,7 +63,22 @@ class WebRTCManager(IWebRTCManager):
         logger.info(f"Created peer connection between {user_id} and {target_id}")
         return pc
     
-    async def _setup_peer_connection_handlers(self, pc: RTCPeerConnection, user_id: str, target_id: str):
+    def _add_peer(self, user: User, target_id: str, pc: "RTCPeerConnection") -> None:
+        """Register a peer connection on a user and update the counters."""
+        user.peer_connections[target_id] = pc
+        self._pc_count += 1
+        self._users_with_conns.add(user.id)
+    
+    def _remove_peer(self, user: User, target_id: str) -> Optional["RTCPeerConnection"]:
+        """Remove a peer connection from a user, update the counters and return it."""
+        pc = user.peer_connections.pop(target_id, None)
+        if pc is not None:
+            self._pc_count -= 1
+            if not user.peer_connections:
+                self._users_with_conns.discard(user.id)
+        return pc
+    
+    async def _setup_peer_connection_handlers(self, pc: "RTCPeerConnection", user_id: str, target_id: str):
         """Set up event handlers for a peer connection."""
         
         @pc.on("connectionstatechange")
@@ -81,22 +117,16 @@ class WebRTCManager(IWebRTCManager):
             logger.warning(f"Target user {target_id} not found for offer from {user_id}")
             return
         
-        if target_user.websocket.closed:
+        if not target_user.is_sendable():
             logger.warning(f"Target user {target_id} WebSocket is closed")
             return
         
-        try:
-            message = {
-                "type": "offer",
-                "sdp": offer_data.get("sdp"),
-                "from_id": user_id
-            }
-            
-            await target_user.websocket.send_str(json.dumps(message))
-            logger.debug(f"Forwarded offer from {user_id} to {target_id}")
-            
-        except Exception as e:
-            logger.error(f"Error forwarding offer from {user_id} to {target_id}: {e}")
+        await self._enqueue(target_id, {
+            "type": "offer",
+            "sdp": offer_data.get("sdp"),
+            "from_id": user_id
+        })
+        logger.debug(f"Queued offer from {user_id} to {target_id}")
     
     async def handle_answer(self, user_id: str, target_id: str, answer_data: dict) -> None:
         """Handle a WebRTC answer from one user to another."""
@@ -105,22 +135,16 @@ class WebRTCManager(IWebRTCManager):
             logger.warning(f"Target user {target_id} not found for answer from {user_id}")
             return
         
-        if target_user.websocket.closed:
+        if not target_user.is_sendable():
             logger.warning(f"Target user {target_id} WebSocket is closed")
             return
         
-        try:
-            message = {
-                "type": "answer",
-                "sdp": answer_data.get("sdp"),
-                "from_id": user_id
-            }
-            
-            await target_user.websocket.send_str(json.dumps(message))
-            logger.debug(f"Forwarded answer from {user_id} to {target_id}")
-            
-        except Exception as e:
-            logger.error(f"Error forwarding answer from {user_id} to {target_id}: {e}")
+        await self._enqueue(target_id, {
+            "type": "answer",
+            "sdp": answer_data.get("sdp"),
+            "from_id": user_id
+        })
+        logger.debug(f"Queued answer from {user_id} to {target_id}")
     
     async def handle_ice_candidate(self, user_id: str, target_id: str, candidate_data: dict) -> None:
         """Handle an ICE candidate from one user to another."""
@@ -129,70 +153,129 @@ class WebRTCManager(IWebRTCManager):
             logger.warning(f"Target user {target_id} not found for ICE candidate from {user_id}")
             return
         
-        if target_user.websocket.closed:
+        if not target_user.is_sendable():
             logger.warning(f"Target user {target_id} WebSocket is closed")
             return
         
+        await self._enqueue(target_id, {
+            "type": "ice_candidate",
+            "candidate": candidate_data.get("candidate"),
+            "from_id": user_id
+        })
+        logger.debug(f"Queued ICE candidate from {user_id} to {target_id}")
+    
+    async def _enqueue(self, target_id: str, message: dict) -> None:
+        """Queue a signalling message for a user, flushing on size or after a short delay."""
+        queue = self._outbox.get(target_id)
+        if queue is None:
+            queue = self._outbox[target_id] = []
+        queue.append(message)
+        
+        if len(queue) >= SIGNALING_BATCH_SIZE:
+            del self._outbox[target_id]
+            await self._send_batch(target_id, queue)
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                SIGNALING_FLUSH_INTERVAL, self._start_flush
+            )
+    
+    def _start_flush(self) -> None:
+        """Timer callback that runs the outbox flush as a task."""
+        self._flush_handle = None
+        task = asyncio.ensure_future(self.flush_outbox())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def flush_outbox(self) -> None:
+        """Send every queued signalling message, one frame per target user."""
+        outbox, self._outbox = self._outbox, {}
+        await asyncio.gather(*(
+            self._send_batch(target_id, messages) for target_id, messages in outbox.items()
+        ))
+    
+    async def close(self) -> None:
+        """Stop the flush timer and deliver any signalling still queued (used at shutdown)."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush_outbox()
+    
+    async def _send_batch(self, target_id: str, messages: List[dict]) -> None:
+        """Send queued messages to a user as a single object or a JSON array."""
+        target_user = self.connection_manager.get_user(target_id)
+        if not target_user or not target_user.is_sendable():
+            logger.debug(f"Dropped {len(messages)} signalling messages for disconnected user {target_id}")
+            return
+        
+        payload = orjson.dumps(messages[0] if len(messages) == 1 else messages)
         try:
-            message = {
-                "type": "ice_candidate",
-                "candidate": candidate_data.get("candidate"),
-                "from_id": user_id
-            }
-            
-            await target_user.websocket.send_str(json.dumps(message))
-            logger.debug(f"Forwarded ICE candidate from {user_id} to {target_id}")
-            
+            await target_user.websocket.send_frame(payload, WSMsgType.TEXT)
+            logger.debug(f"Forwarded {len(messages)} signalling messages to {target_id}")
         except Exception as e:
-            logger.error(f"Error forwarding ICE candidate from {user_id} to {target_id}: {e}")
+            logger.error(f"Error forwarding signalling messages to {target_id}: {e}")
     
     async def cleanup_peer_connection(self, user_id: str, target_id: str) -> None:
         """Clean up a peer connection between two users."""
-        user = self.connection_manager.get_user(user_id)
-        
-        if user and target_id in user.peer_connections:
-            try:
-                pc = user.peer_connections[target_id]
-                
-                # Close the peer connection
-                if pc.connectionState not in ["closed", "failed"]:
-                    await pc.close()
-                
-                # Remove from user's peer connections
-                del user.peer_connections[target_id]
-                
-                logger.info(f"Cleaned up peer connection between {user_id} and {target_id}")
-                
-            except Exception as e:
-                logger.error(f"Error cleaning up peer connection between {user_id} and {target_id}: {e}")
+        await self._cleanup_peer_connection(
+            self.connection_manager.get_user(user_id), user_id,
+            self.connection_manager.get_user(target_id), target_id
+        )
+    
+    async def _cleanup_peer_connection(self, user: Optional[User], user_id: str,
+                                       target_user: Optional[User], target_id: str) -> None:
+        """Clean up a peer connection in both directions for already resolved users."""
+        to_close = []
+        pc = self._remove_peer(user, target_id) if user else None
+        if pc is not None:
+            to_close.append((user_id, target_id, pc))
         
         # Also clean up the reverse connection if it exists
-        target_user = self.connection_manager.get_user(target_id)
-        if target_user and user_id in target_user.peer_connections:
-            try:
-                pc = target_user.peer_connections[user_id]
-                
-                if pc.connectionState not in ["closed", "failed"]:
-                    await pc.close()
-                
-                del target_user.peer_connections[user_id]
-                
-                logger.info(f"Cleaned up reverse peer connection between {target_id} and {user_id}")
-                
-            except Exception as e:
-                logger.error(f"Error cleaning up reverse peer connection between {target_id} and {user_id}: {e}")
+        reverse_pc = self._remove_peer(target_user, user_id) if target_user else None
+        if reverse_pc is not None:
+            to_close.append((target_id, user_id, reverse_pc))
+        
+        await self._close_peers(to_close)
+    
+    async def _close_peers(self, to_close: Iterable[Tuple[str, str, "RTCPeerConnection"]]) -> None:
+        """Close detached (from_id, to_id, pc) peer connections concurrently and log the outcome."""
+        pending = [
+            entry for entry in to_close
+            if entry[2].connectionState not in ("closed", "failed")
+        ]
+        results = await asyncio.gather(
+            *(pc.close() for _, _, pc in pending), return_exceptions=True
+        )
+        for (from_id, to_id, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error cleaning up peer connection between {from_id} and {to_id}: {result}")
+            else:
+                logger.info(f"Cleaned up peer connection between {from_id} and {to_id}")
     
     async def cleanup_all_user_connections(self, user_id: str) -> None:
         """Clean up all peer connections for a user."""
+        # Drop any signalling still queued for this user
+        self._outbox.pop(user_id, None)
+        
         user = self.connection_manager.get_user(user_id)
         if not user:
             return
         
-        # Get list of target IDs to avoid modifying dict during iteration
-        target_ids = list(user.peer_connections.keys())
+        # Detach both directions of every connection first, so each
+        # RTCPeerConnection is collected (and later closed) exactly once
+        to_close = {}
+        for target_id in list(user.peer_connections):
+            pc = self._remove_peer(user, target_id)
+            to_close[id(pc)] = (user_id, target_id, pc)
+            
+            target_user = self.connection_manager.get_user(target_id)
+            reverse_pc = self._remove_peer(target_user, user_id) if target_user else None
+            if reverse_pc is not None:
+                to_close.setdefault(id(reverse_pc), (target_id, user_id, reverse_pc))
         
-        for target_id in target_ids:
-            await self.cleanup_peer_connection(user_id, target_id)
+        await self._close_peers(to_close.values())
         
         logger.info(f"Cleaned up all peer connections for user {user_id}")
     
@@ -203,10 +286,7 @@ class WebRTCManager(IWebRTCManager):
     
     def get_total_connections(self) -> int:
         """Get the total number of active peer connections across all users."""
-        total = 0
-        for user in self.connection_manager.get_all_users().values():
-            total += len(user.peer_connections)
-        return total // 2  # Divide by 2 because each connection is counted twice
+        return self._pc_count // 2  # Divide by 2 because each connection is counted twice
     
     def get_user_connections(self, user_id: str) -> list:
         """Get list of users that a specific user is connected to."""
@@ -215,12 +295,8 @@ class WebRTCManager(IWebRTCManager):
     
     def get_stats(self) -> dict:
         """Get WebRTC connection statistics."""
-        all_users = self.connection_manager.get_all_users()
-        total_connections = sum(len(user.peer_connections) for user in all_users.values()) // 2
-        users_with_connections = sum(1 for user in all_users.values() if user.peer_connections)
-        
         return {
-            "total_peer_connections": total_connections,
-            "users_with_connections": users_with_connections,
+            "total_peer_connections": self.get_total_connections(),
+            "users_with_connections": len(self._users_with_conns),
             "ice_servers_count": len(self.ice_servers)
         }
\ No newline at end of file
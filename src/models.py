@@ -2,39 +2,47 @@
 Data models for the Video Chat Room application.
 """
 
+import time
+import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 from aiohttp import web_ws
-from aiortc import RTCPeerConnection
 
+if TYPE_CHECKING:
+    from aiortc import RTCPeerConnection
 
-@dataclass
+# Wall-clock minus monotonic time at import, for turning monotonic stamps into datetimes
+_WALL_CLOCK_OFFSET = time.time() - time.monotonic()
+
+
+@dataclass(slots=True)
 class User:
     """Represents a user in the video chat system."""
     id: str
     websocket: web_ws.WebSocketResponse
     room_id: Optional[str] = None
-    peer_connections: Dict[str, RTCPeerConnection] = field(default_factory=dict)
+    peer_connections: Dict[str, "RTCPeerConnection"] = field(default_factory=dict)
     joined_at: datetime = field(default_factory=datetime.now)
+    # Set once by the disconnect path so senders can bail out early
+    disconnected: bool = False
+    
+    def is_sendable(self) -> bool:
+        """Check if messages can still be sent to this user."""
+        return not self.disconnected and not self.websocket.closed
     
     def __str__(self) -> str:
         return f"User(id={self.id}, room={self.room_id})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Room:
     """Represents a chat room with multiple users."""
     id: str
-    users: List[str] = field(default_factory=list)
+    users: Set[str] = field(default_factory=set)
     max_users: int = 5
     created_at: datetime = field(default_factory=datetime.now)
-    session_id: str = field(default_factory=lambda: None)
-    
-    def __post_init__(self):
-        if self.session_id is None:
-            import uuid
-            self.session_id = str(uuid.uuid4())
+    session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
     
     @property
     def is_full(self) -> bool:
@@ -50,7 +58,7 @@ class Room:
         return f"Room(id={self.id}, users={self.user_count}/{self.max_users})"
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordingSession:
     """Represents a recording session for a room."""
     session_id: str
@@ -59,10 +67,15 @@ class RecordingSession:
     ended_at: Optional[datetime] = None
     files: List[str] = field(default_factory=list)
     status: str = "active"  # active, stopped, error
+    # Monotonic clock readings used for duration math; datetimes are for display
+    started_mono: float = field(default_factory=time.monotonic)
+    ended_mono: Optional[float] = None
     
     @property
     def duration(self) -> Optional[float]:
         """Get the duration of the recording session in seconds."""
+        if self.ended_mono is not None:
+            return self.ended_mono - self.started_mono
         if self.ended_at:
             return (self.ended_at - self.started_at).total_seconds()
         return None
@@ -76,7 +89,7 @@ class RecordingSession:
         return f"RecordingSession(id={self.session_id}, room={self.room_id}, status={self.status})"
 
 
-@dataclass
+@dataclass(slots=True)
 class FileUpload:
     """Represents an uploaded file."""
     filename: str
@@ -91,19 +104,20 @@ class FileUpload:
         return f"FileUpload(filename={self.filename}, type={self.file_type}, size={self.file_size})"
 
 
-@dataclass
+@dataclass(slots=True)
 class WebSocketMessage:
     """Represents a WebSocket message."""
     type: str
     data: dict
     user_id: str
-    timestamp: datetime = field(default_factory=datetime.now)
+    # time.monotonic() reading; only formatted as a wall-clock time in to_json
+    timestamp: float = field(default_factory=time.monotonic)
     
     def to_json(self) -> dict:
         """Convert the message to a JSON-serializable dictionary."""
         return {
             "type": self.type,
-            "timestamp": self.timestamp.isoformat(),
+            "timestamp": datetime.fromtimestamp(self.timestamp + _WALL_CLOCK_OFFSET).isoformat(),
             **self.data
         }
     
@@ -3,22 +3,61 @@ Main Application Controller for the Video Chat Room.
 Orchestrates all managers and handles WebSocket communications.
 """
 
-import json
+import asyncio
 import logging
+import time
 import uuid
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple, Union
 
+import orjson
 from aiohttp import web, WSMsgType, web_ws
 
 from src.managers import (
     ConnectionManager, RoomManager, SessionManager, 
     StorageManager, WebRTCManager, RecordingManager
 )
-from src.models import WebSocketMessage
-from src.config import MAX_USERS_PER_ROOM
+from src.config import MAX_USERS_PER_ROOM, UPLOAD_CHUNK_SIZE, WS_HEARTBEAT, WS_MAX_MSG_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Module-level aliases so the per-frame hot paths skip attribute lookups
+_dumps = orjson.dumps
+_loads = orjson.loads
+
+# Seconds a computed /stats response is served from cache
+_STATS_CACHE_TTL = 1.0
+
+
+class BadMessage(Exception):
+    """Raised by message handlers when a client message is missing required fields."""
+
+
+def _require(data: dict, *keys: str) -> tuple:
+    """Return the values of the given keys, raising BadMessage if any is missing or empty."""
+    values = tuple(data.get(key) for key in keys)
+    for key, value in zip(keys, values):
+        if not value:
+            raise BadMessage(f"Missing {key}")
+    return values
+
+
+# Encoders for the most frequent room broadcasts, serialized straight to bytes
+def _user_joined(user_id: str, user_count: int) -> bytes:
+    """Encode a user_joined notification."""
+    return _dumps({"type": "user_joined", "user_id": user_id, "user_count": user_count})
+
+
+def _user_left(user_id: str) -> bytes:
+    """Encode a user_left notification."""
+    return _dumps({"type": "user_left", "user_id": user_id})
+
+
+def _recording_status(status: str, session_id: str, duration: Optional[float] = None) -> bytes:
+    """Encode a recording_status notification, with the duration once recording has stopped."""
+    if duration is None:
+        return _dumps({"type": "recording_status", "status": status, "session_id": session_id})
+    return _dumps({"type": "recording_status", "status": status, "session_id": session_id, "duration": duration})
+
 
 class VideoChatApplication:
     """Main application controller orchestrating all managers."""
@@ -32,77 +71,95 @@ class VideoChatApplication:
         self.webrtc_manager = WebRTCManager(self.connection_manager)
         self.recording_manager = RecordingManager(self.storage_manager, self.room_manager)
         
+        # Disconnect cleanups in flight, kept referenced until they finish
+        self._cleanup_tasks: Set[asyncio.Task] = set()
+        
+        # (monotonic time, encoded response) of the last /stats computation
+        self._stats_cache: Optional[Tuple[float, bytes]] = None
+        
+        # Message type -> bound handler, built once so dispatch is a single lookup
+        self._handlers: Dict[str, Callable[[str, dict], Awaitable[None]]] = {
+            "join_room": self.handle_join_room,
+            "leave_room": self.handle_leave_room,
+            "offer": self.handle_webrtc_offer,
+            "answer": self.handle_webrtc_answer,
+            "ice_candidate": self.handle_ice_candidate,
+            "start_recording": self.handle_start_recording,
+            "stop_recording": self.handle_stop_recording,
+        }
+        
         logger.info("VideoChatApplication initialized with all managers")
     
     async def websocket_handler(self, request) -> web_ws.WebSocketResponse:
         """Handle WebSocket connections from clients."""
-        ws = web_ws.WebSocketResponse()
+        # Signalling payloads are small, so per-message compression costs more than it saves
+        ws = web_ws.WebSocketResponse(
+            heartbeat=WS_HEARTBEAT,
+            compress=False,
+            max_msg_size=WS_MAX_MSG_SIZE
+        )
         await ws.prepare(request)
         
-        user_id = str(uuid.uuid4())
+        user_id = uuid.uuid4().hex
         user = await self.connection_manager.add_connection(user_id, ws)
         
         logger.info(f"New WebSocket connection: {user_id}")
         
         try:
             async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    logger.error(f'WebSocket error from {user_id}: {ws.exception()}')
+                    break
+                
                 if msg.type == WSMsgType.TEXT:
+                    # Every client message is a JSON object; reject anything else before decoding
+                    if msg.data.lstrip()[:1] != '{':
+                        logger.error(f"Invalid JSON received from {user_id}")
+                        await self.send_error(user_id, "Invalid message format")
+                        continue
+                    
                     try:
-                        data = json.loads(msg.data)
-                        ws_message = WebSocketMessage.from_json(data, user_id)
-                        await self.handle_message(ws_message)
-                    except json.JSONDecodeError:
+                        data = msg.json(loads=_loads)
+                        message_type = data.pop("type", "unknown")
+                        await self.handle_message(user_id, message_type, data)
+                    except orjson.JSONDecodeError:
                         logger.error(f"Invalid JSON received from {user_id}")
                         await self.send_error(user_id, "Invalid message format")
                     except Exception as e:
                         logger.error(f"Error processing message from {user_id}: {e}")
                         await self.send_error(user_id, "Internal server error")
-                
-                elif msg.type == WSMsgType.ERROR:
-                    logger.error(f'WebSocket error from {user_id}: {ws.exception()}')
         
         except Exception as e:
             logger.error(f"Error in websocket handler for {user_id}: {e}")
         
         finally:
-            await self.cleanup_user(user_id)
+            self.connection_manager.mark_disconnected(user_id)
+            # aiohttp cancels this handler when the client's connection drops, and the
+            # cleanup has real suspension points, so run it in its own tracked task that the
+            # cancellation cannot interrupt
+            cleanup = asyncio.ensure_future(self.cleanup_user(user_id))
+            self._cleanup_tasks.add(cleanup)
+            cleanup.add_done_callback(self._cleanup_tasks.discard)
+            await asyncio.shield(cleanup)
         
         return ws
     
-    async def handle_message(self, message: WebSocketMessage) -> None:
+    async def handle_message(self, user_id: str, message_type: str, data: dict) -> None:
         """Route WebSocket messages to appropriate handlers."""
-        message_type = message.type
-        user_id = message.user_id
-        data = message.data
-        
         logger.debug(f"Handling message {message_type} from {user_id}")
         
+        # Non-string types (e.g. lists) are unhashable and could never name a handler
+        handler = self._handlers.get(message_type) if isinstance(message_type, str) else None
+        if handler is None:
+            logger.warning(f"Unknown message type: {message_type} from {user_id}")
+            await self.send_error(user_id, f"Unknown message type: {message_type}")
+            return
+        
         try:
-            if message_type == "join_room":
-                await self.handle_join_room(user_id, data)
-            
-            elif message_type == "leave_room":
-                await self.handle_leave_room(user_id, data)
-            
-            elif message_type == "offer":
-                await self.handle_webrtc_offer(user_id, data)
-            
-            elif message_type == "answer":
-                await self.handle_webrtc_answer(user_id, data)
-            
-            elif message_type == "ice_candidate":
-                await self.handle_ice_candidate(user_id, data)
-            
-            elif message_type == "start_recording":
-                await self.handle_start_recording(user_id, data)
-            
-            elif message_type == "stop_recording":
-                await self.handle_stop_recording(user_id, data)
-            
-            else:
-                logger.warning(f"Unknown message type: {message_type} from {user_id}")
-                await self.send_error(user_id, f"Unknown message type: {message_type}")
+            await handler(user_id, data)
         
+        except BadMessage as e:
+            await self.send_error(user_id, f"{e} in {message_type}")
         except Exception as e:
             logger.error(f"Error handling {message_type} from {user_id}: {e}")
             await self.send_error(user_id, f"Error processing {message_type}")
@@ -133,33 +190,15 @@ class VideoChatApplication:
         })
         
         # Notify existing users
-        await self.broadcast_to_room(room_id, {
-            "type": "user_joined",
-            "user_id": user_id,
-            "user_count": len(room.users)
-        }, exclude=user_id)
+        await self.broadcast_to_room(room_id, _user_joined(user_id, len(room.users)), exclude=user_id)
         
         logger.info(f"User {user_id} joined room {room_id} ({len(room.users)}/{room.max_users})")
     
     async def handle_leave_room(self, user_id: str, data: dict) -> None:
         """Handle user leaving a room."""
-        old_room_id = await self.room_manager.leave_room(user_id)
+        old_room_id = await self._leave_and_notify(user_id)
         
         if old_room_id:
-            # Stop any recording if user was the last one
-            room = self.room_manager.get_room(old_room_id)
-            if not room:  # Room was deleted (empty)
-                await self.recording_manager.cleanup_room_recording(old_room_id)
-            
-            # Notify remaining users
-            await self.broadcast_to_room(old_room_id, {
-                "type": "user_left",
-                "user_id": user_id
-            }, exclude=user_id)
-            
-            # Clean up WebRTC connections
-            await self.webrtc_manager.cleanup_all_user_connections(user_id)
-            
             # Confirm to user
             await self.send_to_user(user_id, {
                 "type": "room_left",
@@ -168,31 +207,44 @@ class VideoChatApplication:
             
             logger.info(f"User {user_id} left room {old_room_id}")
     
+    async def _leave_and_notify(self, user_id: str) -> Optional[str]:
+        """Take a user out of their room, notify the others and release their resources.
+        
+        Shared by explicit leave_room messages and disconnect cleanup.
+        Returns the ID of the room that was left, if any.
+        """
+        old_room_id = await self.room_manager.leave_room(user_id)
+        
+        # The remaining steps are independent of each other, so run them concurrently
+        tasks = [self.webrtc_manager.cleanup_all_user_connections(user_id)]
+        if old_room_id:
+            # Notify remaining users
+            tasks.append(self.broadcast_to_room(old_room_id, _user_left(user_id), exclude=user_id))
+            
+            # Stop any recording if user was the last one
+            if not self.room_manager.get_room(old_room_id):  # Room was deleted (empty)
+                tasks.append(self.recording_manager.cleanup_room_recording(old_room_id))
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error while {user_id} was leaving room {old_room_id}: {result}")
+        
+        return old_room_id
+    
     async def handle_webrtc_offer(self, user_id: str, data: dict) -> None:
         """Handle WebRTC offer signaling."""
-        target_id = data.get("target_id")
-        if not target_id:
-            await self.send_error(user_id, "Missing target_id in offer")
-            return
-        
+        (target_id,) = _require(data, "target_id")
         await self.webrtc_manager.handle_offer(user_id, target_id, data)
     
     async def handle_webrtc_answer(self, user_id: str, data: dict) -> None:
         """Handle WebRTC answer signaling."""
-        target_id = data.get("target_id")
-        if not target_id:
-            await self.send_error(user_id, "Missing target_id in answer")
-            return
-        
+        (target_id,) = _require(data, "target_id")
         await self.webrtc_manager.handle_answer(user_id, target_id, data)
     
     async def handle_ice_candidate(self, user_id: str, data: dict) -> None:
         """Handle ICE candidate signaling."""
-        target_id = data.get("target_id")
-        if not target_id:
-            await self.send_error(user_id, "Missing target_id in ICE candidate")
-            return
-        
+        (target_id,) = _require(data, "target_id")
         await self.webrtc_manager.handle_ice_candidate(user_id, target_id, data)
     
     async def handle_start_recording(self, user_id: str, data: dict) -> None:
@@ -213,11 +265,7 @@ class VideoChatApplication:
             })
             
             # Notify all users in room
-            await self.broadcast_to_room(user.room_id, {
-                "type": "recording_status",
-                "status": "started",
-                "session_id": session_id
-            })
+            await self.broadcast_to_room(user.room_id, _recording_status("started", session_id))
             
             logger.info(f"Recording started by {user_id} in room {user.room_id}")
             
@@ -242,43 +290,35 @@ class VideoChatApplication:
             })
             
             # Notify all users in room
-            await self.broadcast_to_room(user.room_id, {
-                "type": "recording_status",
-                "status": "stopped",
-                "session_id": recording.session_id,
-                "duration": recording.duration
-            })
+            await self.broadcast_to_room(
+                user.room_id, _recording_status("stopped", recording.session_id, recording.duration)
+            )
             
             logger.info(f"Recording stopped by {user_id} in room {user.room_id}")
         else:
             await self.send_error(user_id, "No active recording found")
     
-    async def broadcast_to_room(self, room_id: str, message: dict, exclude: Optional[str] = None) -> None:
-        """Broadcast a message to all users in a room."""
-        room_users = self.room_manager.get_room_users(room_id)
-        message_str = json.dumps(message)
-        
-        sent_count = 0
-        for user_id in room_users:
-            if user_id != exclude:
-                user = self.connection_manager.get_user(user_id)
-                if user and not user.websocket.closed:
-                    try:
-                        await user.websocket.send_str(message_str)
-                        sent_count += 1
-                    except Exception as e:
-                        logger.error(f"Error broadcasting to {user_id}: {e}")
+    async def broadcast_to_room(self, room_id: str, message: Union[dict, bytes],
+                                exclude: Optional[str] = None) -> None:
+        """Broadcast a message (a dict, or an already-encoded JSON payload) to all users in a room."""
+        # Serialize once; the connection manager fans the writes out concurrently
+        payload = message if isinstance(message, bytes) else _dumps(message)
+        sent_count = await self.connection_manager.broadcast_bytes(room_id, payload, exclude=exclude)
         
         logger.debug(f"Broadcasted message to {sent_count} users in room {room_id}")
     
     async def send_to_user(self, user_id: str, message: dict) -> bool:
         """Send a message to a specific user."""
         user = self.connection_manager.get_user(user_id)
-        if not user or user.websocket.closed:
+        if not user:
+            return False
+        
+        ws = user.websocket
+        if ws.closed:
             return False
         
         try:
-            await user.websocket.send_str(json.dumps(message))
+            await ws.send_frame(_dumps(message), WSMsgType.TEXT)
             return True
         except Exception as e:
             logger.error(f"Error sending message to {user_id}: {e}")
@@ -294,30 +334,34 @@ class VideoChatApplication:
     async def cleanup_user(self, user_id: str) -> None:
         """Clean up all resources when a user disconnects."""
         try:
-            # Leave room and notify others
-            old_room_id = await self.room_manager.leave_room(user_id)
-            if old_room_id:
-                await self.broadcast_to_room(old_room_id, {
-                    "type": "user_left",
-                    "user_id": user_id
-                }, exclude=user_id)
-                
-                # Clean up recording if room is empty
-                room = self.room_manager.get_room(old_room_id)
-                if not room:  # Room was deleted
-                    await self.recording_manager.cleanup_room_recording(old_room_id)
-            
-            # Clean up WebRTC connections
-            await self.webrtc_manager.cleanup_all_user_connections(user_id)
-            
-            # Remove connection
-            await self.connection_manager.remove_connection(user_id)
+            try:
+                # Leave room, notify others and release WebRTC/recording resources
+                await self._leave_and_notify(user_id)
+            finally:
+                # Remove connection even if the steps above failed or were cancelled
+                await self._remove_user(user_id)
             
             logger.info(f"Cleaned up user: {user_id}")
             
         except Exception as e:
             logger.error(f"Error during cleanup for user {user_id}: {e}")
     
+    async def _remove_user(self, user_id: str) -> None:
+        """Drop a user's connection, first releasing peer connections the leave path missed."""
+        try:
+            # Peer connections must go through the WebRTC manager to keep its counters right
+            leftover = self.webrtc_manager.get_connection_count(user_id)
+            if leftover:
+                logger.warning(f"Releasing {leftover} leftover peer connections for {user_id}")
+                await self.webrtc_manager.cleanup_all_user_connections(user_id)
+        finally:
+            await self.connection_manager.remove_connection(user_id)
+    
+    async def wait_for_cleanups(self) -> None:
+        """Wait for disconnect cleanups that are still running."""
+        if self._cleanup_tasks:
+            await asyncio.gather(*self._cleanup_tasks, return_exceptions=True)
+    
     async def upload_file(self, request) -> web.Response:
         """Handle file upload with session management."""
         try:
@@ -339,20 +383,20 @@ class VideoChatApplication:
                     "message": "No valid audio or video file found"
                 }, status=400)
             
-            # Read file data
-            data = await field.read()
             filename = field.filename or f"{field.name}_upload.bin"
             
-            # Save file
-            filepath = await self.storage_manager.save_file(session_id, filename, data)
+            # Stream the part to disk in bounded chunks instead of buffering it
+            filepath, file_size = await self.storage_manager.save_stream(
+                session_id, filename, self._read_field_chunks(field)
+            )
             
-            logger.info(f"File uploaded: {filepath} ({len(data)} bytes)")
+            logger.info(f"File uploaded: {filepath} ({file_size} bytes)")
             
             return web.json_response({
                 "success": True,
                 "filename": filename,
                 "session_id": session_id,
-                "file_size": len(data),
+                "file_size": file_size,
                 "message": "File uploaded successfully"
             })
             
@@ -368,6 +412,15 @@ class VideoChatApplication:
                 "message": "Failed to upload file"
             }, status=500)
     
+    @staticmethod
+    async def _read_field_chunks(field) -> AsyncIterator[bytes]:
+        """Yield a multipart field's body in fixed-size chunks."""
+        while True:
+            chunk = await field.read_chunk(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    
     async def get_session_files(self, request) -> web.Response:
         """Get list of files in a session."""
         session_id = request.match_info.get('session_id')
@@ -378,8 +431,11 @@ class VideoChatApplication:
             }, status=400)
         
         try:
-            files = await self.storage_manager.get_session_file_details(session_id)
-            session_size = await self.storage_manager.get_session_size(session_id)
+            # Both walk the session folder off the event loop, so let them overlap
+            files, session_size = await asyncio.gather(
+                self.storage_manager.get_session_file_details(session_id),
+                self.storage_manager.get_session_size(session_id)
+            )
             
             return web.json_response({
                 "success": True,
@@ -397,7 +453,11 @@ class VideoChatApplication:
             }, status=500)
     
     async def get_stats(self, request) -> web.Response:
-        """Get application statistics."""
+        """Get application statistics, recomputed at most once per _STATS_CACHE_TTL."""
+        now = time.monotonic()
+        if self._stats_cache is not None and now - self._stats_cache[0] < _STATS_CACHE_TTL:
+            return web.Response(body=self._stats_cache[1], content_type='application/json')
+        
         try:
             stats = {
                 "connections": self.connection_manager.get_stats(),
@@ -408,10 +468,12 @@ class VideoChatApplication:
                 "storage": self.storage_manager.get_stats()
             }
             
-            return web.json_response({
+            body = _dumps({
                 "success": True,
                 "stats": stats
             })
+            self._stats_cache = (now, body)
+            return web.Response(body=body, content_type='application/json')
             
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
@@ -0,0 +1,57 @@
+"""
+Tests for the wildcard CORS middleware.
+"""
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from main import _add_vary_origin, create_app
+
+ORIGIN = 'https://client.example'
+
+
+async def _fetch(method, path, headers):
+    app = await create_app()
+    async with TestClient(TestServer(app)) as client:
+        async with client.request(method, path, headers=headers) as resp:
+            return resp.status, resp.headers.copy()
+
+
+def test_unknown_path_is_404_with_cors_headers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    status, headers = asyncio.run(_fetch('GET', '/nope', {'Origin': ORIGIN}))
+    assert status == 404
+    assert headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert headers['Vary'] == 'Origin'
+
+
+def test_preflight_is_answered_by_middleware(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    status, headers = asyncio.run(_fetch('OPTIONS', '/upload', {
+        'Origin': ORIGIN,
+        'Access-Control-Request-Method': 'POST',
+        'Access-Control-Request-Headers': 'content-type',
+    }))
+    assert status == 204
+    assert headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert headers['Access-Control-Allow-Methods'] == 'POST'
+    assert headers['Access-Control-Allow-Headers'] == 'content-type'
+
+
+def test_expose_headers_lists_response_header_names(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    status, headers = asyncio.run(_fetch('GET', '/', {'Origin': ORIGIN}))
+    assert status == 200
+    exposed = headers['Access-Control-Expose-Headers'].split(',')
+    assert 'ETag' in exposed
+    assert '*' not in exposed
+    assert 'Content-Type' not in exposed
+
+
+def test_vary_origin_is_appended():
+    response = web.Response(headers={'Vary': 'Accept-Encoding'})
+    _add_vary_origin(response)
+    _add_vary_origin(response)
+    assert response.headers['Vary'] == 'Accept-Encoding, Origin'
@@ -0,0 +1,35 @@
+"""
+Tests for RoomManager membership bookkeeping.
+"""
+
+import asyncio
+
+from src.managers import ConnectionManager, RoomManager
+
+
+def test_rejoin_same_room_keeps_room_and_counters():
+    """A sole member re-joining its room must not orphan the room or skew the stats."""
+    async def scenario():
+        connection_manager = ConnectionManager()
+        room_manager = RoomManager(connection_manager)
+        await connection_manager.add_connection("u", websocket=object())
+
+        assert await room_manager.join_room("u", "r")
+        assert await room_manager.join_room("u", "r")
+
+        room = room_manager.get_room("r")
+        assert room is not None and room.users == {"u"}
+        assert room_manager.get_available_rooms() == [room]
+        stats = room_manager.get_stats()
+        assert stats["total_rooms"] == 1
+        assert stats["empty_rooms"] == 0
+        assert stats["total_users_in_rooms"] == 1
+
+        assert await room_manager.leave_room("u") == "r"
+        assert room_manager.get_available_rooms() == []
+        stats = room_manager.get_stats()
+        assert stats["total_rooms"] == 0
+        assert stats["empty_rooms"] == 0
+        assert stats["total_users_in_rooms"] == 0
+
+    asyncio.run(scenario())
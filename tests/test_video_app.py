@@ -0,0 +1,142 @@
+"""
+Tests for WebSocket lifecycle handling in VideoChatApplication.
+"""
+
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from main import create_app
+
+
+async def _join(client: TestClient, room_id: str):
+    ws = await client.ws_connect('/ws')
+    await ws.send_json({"type": "join_room", "room_id": room_id})
+    joined = await ws.receive_json(timeout=2)
+    assert joined["type"] == "room_joined"
+    return ws
+
+
+def test_disconnect_notifies_room_and_removes_user(tmp_path, monkeypatch):
+    """A client dropping its socket is cleaned up even though aiohttp cancels the handler."""
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        app = await create_app()
+        chat_app = app['chat_app']
+        async with TestClient(TestServer(app)) as client:
+            first = await _join(client, "r")
+            second = await _join(client, "r")
+
+            notice = await first.receive_json(timeout=2)
+            assert notice["type"] == "user_joined"
+
+            await second.close()
+
+            notice = await first.receive_json(timeout=2)
+            assert notice["type"] == "user_left"
+
+            # Cleanup finishes in the background after the notification is sent
+            for _ in range(50):
+                if chat_app.connection_manager.get_stats()["total_connections"] == 1:
+                    break
+                await asyncio.sleep(0.02)
+            assert chat_app.connection_manager.get_stats()["total_connections"] == 1
+            assert chat_app.room_manager.get_room_users("r") == [
+                next(iter(chat_app.connection_manager.get_all_users()))
+            ]
+
+            await first.close()
+
+    asyncio.run(scenario())
+
+
+def test_object_frame_with_leading_whitespace_is_accepted(tmp_path, monkeypatch):
+    """Whitespace before a JSON object is valid JSON and must reach the dispatcher."""
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        app = await create_app()
+        async with TestClient(TestServer(app)) as client:
+            ws = await client.ws_connect('/ws')
+            await ws.send_str(' \n{"type": "join_room", "room_id": "r"}')
+            reply = await ws.receive_json(timeout=2)
+            assert reply["type"] == "room_joined"
+
+            await ws.send_str('["join_room"]')
+            reply = await ws.receive_json(timeout=2)
+            assert reply == {"type": "error", "message": "Invalid message format"}
+
+            await ws.close()
+
+    asyncio.run(scenario())
+
+
+def test_non_string_message_type_is_unknown(tmp_path, monkeypatch):
+    """An unhashable "type" gets the unknown-type error, not an internal error."""
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        app = await create_app()
+        async with TestClient(TestServer(app)) as client:
+            ws = await client.ws_connect('/ws')
+            await ws.send_str('{"type": [1]}')
+            reply = await ws.receive_json(timeout=2)
+            assert reply == {"type": "error", "message": "Unknown message type: [1]"}
+
+            await ws.close()
+
+    asyncio.run(scenario())
+
+
+class _FakePeerConnection:
+    connectionState = "connected"
+
+    async def close(self):
+        self.connectionState = "closed"
+
+
+def test_peer_counters_recover_when_leave_cleanup_fails(tmp_path, monkeypatch):
+    """Peer connections left behind by a failed leave step are released via the WebRTC manager."""
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        app = await create_app()
+        chat_app = app['chat_app']
+        webrtc_manager = chat_app.webrtc_manager
+        async with TestClient(TestServer(app)) as client:
+            first = await _join(client, "r")
+            second = await _join(client, "r")
+            await first.receive_json(timeout=2)  # user_joined
+
+            first_id, second_id = list(chat_app.connection_manager.get_all_users())
+            first_user = chat_app.connection_manager.get_user(first_id)
+            second_user = chat_app.connection_manager.get_user(second_id)
+            webrtc_manager._add_peer(first_user, second_id, _FakePeerConnection())
+            webrtc_manager._add_peer(second_user, first_id, _FakePeerConnection())
+            assert webrtc_manager.get_stats()["total_peer_connections"] == 1
+
+            original = webrtc_manager.cleanup_all_user_connections
+            calls = []
+
+            async def fail_once(user_id):
+                calls.append(user_id)
+                if len(calls) == 1:
+                    raise RuntimeError("boom")
+                await original(user_id)
+
+            monkeypatch.setattr(webrtc_manager, "cleanup_all_user_connections", fail_once)
+            await second.close()
+            for _ in range(50):
+                if chat_app.connection_manager.get_stats()["total_connections"] == 1:
+                    break
+                await asyncio.sleep(0.02)
+
+            stats = webrtc_manager.get_stats()
+            assert stats["total_peer_connections"] == 0
+            assert stats["users_with_connections"] == 0
+            assert chat_app.connection_manager.get_stats()["total_connections"] == 1
+
+            await first.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+"""
+Tests for WebRTCManager signalling batching.
+"""
+
+import asyncio
+
+import orjson
+from aiohttp import WSMsgType
+
+from src.config import SIGNALING_FLUSH_INTERVAL
+from src.managers import ConnectionManager, WebRTCManager
+from src.managers import webrtc_manager as webrtc_module
+
+
+class RecordingWebSocket:
+    """Minimal WebSocket stand-in that records the text frames sent to it."""
+
+    closed = False
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_frame(self, payload, opcode):
+        assert opcode == WSMsgType.TEXT
+        self.frames.append(orjson.loads(payload))
+
+    async def close(self):
+        self.closed = True
+
+
+async def _setup():
+    connection_manager = ConnectionManager()
+    manager = WebRTCManager(connection_manager)
+    ws = RecordingWebSocket()
+    await connection_manager.add_connection("b", ws)
+    return manager, ws
+
+
+def test_single_queued_message_is_sent_as_an_object():
+    async def scenario():
+        manager, ws = await _setup()
+        await manager.handle_offer("a", "b", {"sdp": "o"})
+        assert ws.frames == []
+
+        await asyncio.sleep(SIGNALING_FLUSH_INTERVAL * 5)
+        assert ws.frames == [{"type": "offer", "sdp": "o", "from_id": "a"}]
+
+    asyncio.run(scenario())
+
+
+def test_messages_queued_together_are_sent_as_one_array():
+    async def scenario():
+        manager, ws = await _setup()
+        await manager.handle_offer("a", "b", {"sdp": "o"})
+        await manager.handle_ice_candidate("a", "b", {"candidate": "c"})
+
+        await asyncio.sleep(SIGNALING_FLUSH_INTERVAL * 5)
+        assert ws.frames == [[
+            {"type": "offer", "sdp": "o", "from_id": "a"},
+            {"type": "ice_candidate", "candidate": "c", "from_id": "a"},
+        ]]
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_is_sent_without_waiting(monkeypatch):
+    monkeypatch.setattr(webrtc_module, "SIGNALING_BATCH_SIZE", 3)
+
+    async def scenario():
+        manager, ws = await _setup()
+        for i in range(3):
+            await manager.handle_ice_candidate("a", "b", {"candidate": str(i)})
+        assert ws.frames == [[
+            {"type": "ice_candidate", "candidate": str(i), "from_id": "a"} for i in range(3)
+        ]]
+
+        # The armed timer finds nothing left to send
+        await asyncio.sleep(SIGNALING_FLUSH_INTERVAL * 5)
+        assert len(ws.frames) == 1
+
+    asyncio.run(scenario())
+
+
+def test_close_flushes_pending_messages_and_cancels_timer():
+    async def scenario():
+        manager, ws = await _setup()
+        await manager.handle_answer("a", "b", {"sdp": "x"})
+
+        await manager.close()
+        assert ws.frames == [{"type": "answer", "sdp": "x", "from_id": "a"}]
+        assert manager._flush_handle is None
+
+        await asyncio.sleep(SIGNALING_FLUSH_INTERVAL * 5)
+        assert len(ws.frames) == 1
+
+    asyncio.run(scenario())